@@ -1,12 +1,12 @@
 import streamlit as st
 import gspread
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import requests
 import time
-import random
-from datetime import datetime, timedelta
+
+from pei.data import get_market_data, get_stock_options, get_strategy_suggestion, get_strategy_tags, fetch_finmind_history, fetch_strategy_snapshots
 
 # --- 0. 基礎設定 ---
 PORTFOLIO_SHEET_TITLE = 'Streamlit TW Stock_Pei' 
@@ -30,133 +30,63 @@ st.markdown("""
 
 # --- 1. 核心數據處理 ---
 
+@st.cache_resource
 def get_gsheet_client():
+    """
+    gspread 連線於整個程序共用，省去每次讀寫都重新簽 JWT 與建立連線；呼叫端請勿修改此物件
+    """
     credentials = st.secrets["gcp_service_account"]
     return gspread.service_account_from_dict(credentials)
 
+@st.cache_resource
+def get_worksheet():
+    """
+    庫存工作表的 handle 同樣共用，讀寫時不必再以標題搜尋試算表
+    """
+    return get_gsheet_client().open(PORTFOLIO_SHEET_TITLE).sheet1
+
 @st.cache_data(ttl=300)
 def load_portfolio():
     try:
-        gc = get_gsheet_client()
-        sh = gc.open(PORTFOLIO_SHEET_TITLE)
-        df = pd.DataFrame(sh.sheet1.get_all_records())
+        # 一次取回二維字串表再建 DataFrame，省去 gspread 逐列組 dict
+        rows = get_worksheet().get_all_values()
+        df = pd.DataFrame(rows[1:], columns=rows[0])
         df['Symbol'] = df['Symbol'].astype(str).str.zfill(4)
         df['Cost'] = pd.to_numeric(df['Cost'], errors='coerce').fillna(0.0)
-        df['Shares'] = pd.to_numeric(df['Shares'], errors='coerce').fillna(0)
+        df['Shares'] = pd.to_numeric(df['Shares'], errors='coerce').fillna(0).astype('int32')
         return df
-    except:
+    except Exception:
         return pd.DataFrame(columns=['Symbol', 'Name', 'Cost', 'Shares', 'Note'])
 
-@st.cache_data(ttl=3600)
-def get_market_data():
-    url = "https://stock.wespai.com/lists"
-    try:
-        res = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
-        df = pd.read_html(res.text)[0]
-        data = df.iloc[:, [0, 1, 2, 3, 14, 15]].copy()
-        data.columns = ['代碼', '名稱', '產業', '現價', 'PE', 'PB']
-        data['代碼'] = data['代碼'].astype(str).str.zfill(4)
-        data['現價'] = pd.to_numeric(data['現價'], errors='coerce')
-        data['PE'] = pd.to_numeric(data['PE'], errors='coerce').fillna(999.0)
-        data['PB'] = pd.to_numeric(data['PB'], errors='coerce').fillna(999.0)
-        return data.set_index('代碼').to_dict('index')
-    except Exception as e:
-        st.error(f"市場數據抓取失敗: {e}")
-        return {}
+# 以代碼為索引的 DataFrame，篩選與逐檔查詢都直接在欄位上進行
+MARKET_DF = get_market_data()
 
-MARKET_MAP = get_market_data()
-STOCK_OPTIONS = [f"{k} {v['名稱']} ({v['產業']})" for k, v in MARKET_MAP.items()]
+# 圖表顯示的交易日數
+PLOT_ROWS = 252
 
-def get_strategy_suggestion(df):
-    if df is None or df.empty or len(df) < 26: 
-        return ("資料不足", "#9e9e9e", "<span>資料不足以產生訊號</span>", "")
-    last_row = df.iloc[-1]
-    prev_row = df.iloc[-2]
-    curr_price = last_row['Close']
-    rsi = last_row['RSI']
-    macd_hist = last_row['Hist']
-    prev_macd_hist = prev_row['Hist']
-    bb_lower = last_row['Lower']
-    sma20 = last_row['SMA20']
-    sma60 = last_row['SMA60']
-    
-    is_panic = rsi < 25
-    is_oversold = rsi < 35
-    is_buy_zone = curr_price < bb_lower * 1.02
-    macd_turn_up = macd_hist < 0 and macd_hist > prev_macd_hist
-    is_bullish_trend = curr_price > sma20 and sma20 > sma60
-    
-    if is_panic:
-        return ("極度恐慌", "#d32f2f", f"<div style='background:#ffebee; padding:10px; border-left:5px solid #d32f2f; border-radius:5px;'><b style='color:#d32f2f'>⚠️ 極度恐慌 (RSI < 25)</b><br>RSI: {rsi:.1f}，市場情緒悲觀。</div>", f"RSI: {rsi:.1f}")
-    elif is_oversold and is_buy_zone and macd_turn_up:
-        return ("黃金買訊", "#2e7d32", f"<div style='background:#e8f5e9; padding:10px; border-left:5px solid #2e7d32; border-radius:5px;'><b style='color:#2e7d32'>🔥 強力買進訊號</b><br>RSI低檔 + 布林下軌 + MACD轉折。</div>", "技術面買訊")
-    elif rsi > 75:
-        return ("高檔過熱", "#ef6c00", f"<div style='background:#fff3e0; padding:10px; border-left:5px solid #ef6c00; border-radius:5px;'><b style='color:#ef6c00'>⛔ 高檔過熱 (RSI > 75)</b><br>RSI: {rsi:.1f}，建議減碼。</div>", f"RSI: {rsi:.1f}")
-    elif is_bullish_trend and macd_hist > 0:
-        return ("多頭續抱", "#1976d2", f"<div style='background:#e3f2fd; padding:10px; border-left:5px solid #1976d2; border-radius:5px;'><b style='color:#1976d2'>📈 多頭排列</b><br>股價動能強勁。</div>", "動能強勁")
-    else:
-        return ("觀望整理", "#757575", f"<div style='background:#f5f5f5; padding:10px; border-left:5px solid #757575; border-radius:5px;'><b style='color:#616161'>☕ 盤整中</b><br>等待趨勢確立。</div>", f"RSI: {rsi:.1f}")
-
-@st.cache_data(ttl=600)
-def fetch_finmind_history(symbol):
+@st.cache_resource(max_entries=32)
+def build_fig(name, last_ts, last_close, _p):
     """
-    取代 yfinance 爬取 FinMind 的數據，並維持原始技術指標邏輯
+    建立技術分析圖表；以 (名稱, 最後日期, 最後收盤) 為快取鍵，資料未更新時直接重用同一個 Figure
     """
-    time.sleep(random.uniform(0.1, 0.3)) # FinMind 速度較快，縮短間隔
-    try:
-        # 設定抓取 2 年數據
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=730)).strftime('%Y-%m-%d')
-        
-        # 使用 FinMind 開放 API
-        url = "https://api.finmindtrade.com/api/v4/data"
-        params = {
-            "dataset": "TaiwanStockPrice",
-            "data_id": symbol,
-            "start_date": start_date,
-            "end_date": end_date,
-        }
-        
-        res = requests.get(url, params=params)
-        data = res.json()
-        
-        if data['msg'] != 'success' or not data['data']:
-            return None
-        
-        df = pd.DataFrame(data['data'])
-        # 統一欄位名稱與 yfinance 格式一致以維持後續邏輯
-        df = df.rename(columns={
-            'date': 'Date',
-            'open': 'Open',
-            'max': 'High',
-            'min': 'Low',
-            'close': 'Close',
-            'trading_volume': 'Volume'
-        })
-        df['Date'] = pd.to_datetime(df['Date'])
-        df.set_index('Date', inplace=True)
-        
-        # --- 維持原代碼指標運算邏輯 ---
-        df['SMA20'] = df['Close'].rolling(20).mean()
-        df['SMA60'] = df['Close'].rolling(60).mean()
-        std20 = df['Close'].rolling(20).std()
-        df['Lower'] = df['SMA20'] - (std20 * 2)
-        
-        delta = df['Close'].diff()
-        gain = delta.clip(lower=0).rolling(14).mean()
-        loss = -delta.clip(upper=0).rolling(14).mean()
-        df['RSI'] = 100 - (100 / (1 + (gain/(loss+1e-9))))
-        
-        exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['Hist'] = df['MACD'] - df['Signal']
-        
-        return df
-    except Exception as e:
-        # st.error(f"獲取 {symbol} 失敗: {e}")
-        return None
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.5, 0.2, 0.3],
+                        subplot_titles=("股價 K 線與均線", "RSI 強弱指標", "MACD 指標"))
+    # 只畫最近約一年，送往前端的 JSON 減半；payload 已是 float32
+    x, ohlc = _p['index'][-PLOT_ROWS:], _p['ohlc'][-PLOT_ROWS:]
+    tail = {k: _p[k][-PLOT_ROWS:] for k in ['sma20', 'sma60', 'lower', 'rsi', 'macd', 'signal', 'hist']}
+    fig.add_trace(go.Candlestick(x=x, open=ohlc[:, 0], high=ohlc[:, 1], low=ohlc[:, 2], close=ohlc[:, 3], name='K線'), row=1, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['sma20'], line=dict(color='orange', width=1), name='20MA'), row=1, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['sma60'], line=dict(color='blue', width=1), name='60MA'), row=1, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['lower'], line=dict(color='rgba(200,200,200,0.5)', dash='dot'), name='BB下軌'), row=1, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['rsi'], line=dict(color='purple'), name='RSI(14)'), row=2, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=2, col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=2, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['macd'], line=dict(color='blue'), name='DIF'), row=3, col=1)
+    fig.add_trace(go.Scattergl(x=x, y=tail['signal'], line=dict(color='orange'), name='MACD'), row=3, col=1)
+    bar_colors = np.where(tail['hist'] >= 0, '#eb093b', '#00a651')
+    fig.add_trace(go.Bar(x=x, y=tail['hist'], marker_color=bar_colors, name='OSC柱狀圖'), row=3, col=1)
+    fig.update_layout(height=850, xaxis_rangeslider_visible=False, template="plotly_white", uirevision="static")
+    return fig
 
 # --- 2. 側邊導覽 ---
 with st.sidebar:
@@ -177,20 +107,19 @@ if st.session_state.menu == "portfolio":
     st.markdown('<div class="function-title">功能：🚀 庫存動態監控</div>', unsafe_allow_html=True)
     portfolio = st.session_state.df_portfolio
     if not portfolio.empty:
-        total_mv, total_cost = 0.0, 0.0
-        details = []
-        for _, r in portfolio.iterrows():
-            m_data = MARKET_MAP.get(r['Symbol'])
-            if m_data:
-                curr_p = m_data['現價']
-                mv = curr_p * r['Shares']
-                cv = r['Cost'] * r['Shares']
-                total_mv += mv
-                total_cost += cv
-                # 改用 FinMind
-                hist_df = fetch_finmind_history(r['Symbol'])
-                strat_name, strat_color, _, _ = get_strategy_suggestion(hist_df)
-                details.append({'r': r, 'm': m_data, 'cp': curr_p, 'strat': (strat_name, strat_color), 'df': hist_df})
+        # 以整欄運算取代 iterrows，只保留市場資料中查得到的標的
+        held = portfolio[portfolio['Symbol'].isin(MARKET_DF.index)]
+        symbols = held['Symbol'].to_numpy()
+        # 整批並行更新庫存歷史數據，避免逐檔往返；卡片只取策略判讀所需的最後兩列
+        snapshots = fetch_strategy_snapshots(tuple(sorted(set(symbols))))
+        market = MARKET_DF.loc[symbols]
+        costs = held['Cost'].to_numpy(np.float64)
+        shares = held['Shares'].to_numpy(np.float64)
+        prices = market['現價'].to_numpy(np.float64)
+        total_mv = float((prices * shares).sum())
+        total_cost = float((costs * shares).sum())
+        p_pcts = np.divide((prices - costs) * 100, costs, out=np.zeros_like(prices), where=costs > 0)
+        strats = get_strategy_tags([snapshots.get(s) for s in symbols])
 
         diff = total_mv - total_cost
         p_ratio = (diff / total_cost * 100) if total_cost > 0 else 0
@@ -206,25 +135,32 @@ if st.session_state.menu == "portfolio":
         """, unsafe_allow_html=True)
 
         cols = st.columns(3)
-        for i, item in enumerate(details):
-            r, m, cp, strat, h_df = item['r'], item['m'], item['cp'], item['strat'], item['df']
-            p_pct = (cp - r['Cost']) / r['Cost'] * 100 if r['Cost'] > 0 else 0
-            with cols[i % 3]:
-                st.markdown(f"""
-                <div class="stock-card">
-                    <div style="display:flex; justify-content:space-between;"><b>{r['Name']} ({r['Symbol']})</b> <span class="group-tag">{m['產業']}</span></div>
-                    <div style="margin:10px 0;">
-                        <span style="font-size:1.6em;font-weight:bold;">${cp:.2f}</span>
-                        <span class="{'profit-up' if p_pct>=0 else 'profit-down'}" style="margin-left:10px;">{'+' if p_pct>=0 else ''}{p_pct:.2f}%</span>
-                    </div>
-                    <div style="font-size:0.85em; color:#666; border-top:1px dashed #eee; padding-top:8px;">
-                        PE: {m['PE']} | PB: {m['PB']} | 成本: {r['Cost']}
-                    </div>
-                    <div class="strategy-tag" style="background-color:{strat[1]};">策略建議: {strat[0]}</div>
+        rows = zip(held['Name'].to_numpy(), symbols, held['Cost'].to_numpy(), prices, p_pcts, strats,
+                   market['產業'].to_numpy(), market['PE'].to_numpy(), market['PB'].to_numpy())
+        # 每欄的卡片 HTML 合併成一次 markdown 輸出，按鈕需要各自的元件 id，於卡片下方另外輸出
+        col_html, col_buttons = [[], [], []], [[], [], []]
+        for i, (name, sym, cost, cp, p_pct, strat, industry, pe, pb) in enumerate(rows):
+            col_html[i % 3].append(f"""
+            <div class="stock-card">
+                <div style="display:flex; justify-content:space-between;"><b>{name} ({sym})</b> <span class="group-tag">{industry}</span></div>
+                <div style="margin:10px 0;">
+                    <span style="font-size:1.6em;font-weight:bold;">${cp:.2f}</span>
+                    <span class="{'profit-up' if p_pct>=0 else 'profit-down'}" style="margin-left:10px;">{'+' if p_pct>=0 else ''}{p_pct:.2f}%</span>
                 </div>
-                """, unsafe_allow_html=True)
-                if st.button(f"查看技術分析 {r['Symbol']}", key=f"btn_{r['Symbol']}"):
-                    if h_df is not None: st.session_state.current_plot = (h_df, r['Name'])
+                <div style="font-size:0.85em; color:#666; border-top:1px dashed #eee; padding-top:8px;">
+                    PE: {pe} | PB: {pb} | 成本: {cost}
+                </div>
+                <div class="strategy-tag" style="background-color:{strat[1]};">策略建議: {strat[0]}</div>
+            </div>
+            """)
+            col_buttons[i % 3].append((sym, name))
+        for col, html_chunks, buttons in zip(cols, col_html, col_buttons):
+            with col:
+                if html_chunks: st.markdown(''.join(html_chunks), unsafe_allow_html=True)
+                for sym, name in buttons:
+                    if st.button(f"查看技術分析 {sym}", key=f"btn_{sym}"):
+                        h_df = fetch_finmind_history(sym)
+                        if h_df is not None: st.session_state.current_plot = (h_df, name)
 
 elif st.session_state.menu == "screening":
     st.markdown('<div class="function-title">功能：💰 低基期潛力標的快篩</div>', unsafe_allow_html=True)
@@ -233,11 +169,12 @@ elif st.session_state.menu == "screening":
     pb_lim = c2.number_input("PB 淨值比上限", value=1.2)
     
     if c3.button("啟動掃描"):
-        results = []
-        for k, v in MARKET_MAP.items():
-            if 0 < v['PE'] <= pe_lim and 0 < v['PB'] <= pb_lim:
-                results.append({'代碼': k, '名稱': v['名稱'], '產業': v['產業'], '現價': v['現價'], 'PE': v['PE'], 'PB': v['PB']})
-        df_res = pd.DataFrame(results)
+        # 一次布林遮罩完成 PE/PB 篩選；上限轉成與欄位相同的 float32，避免 12.3 這類邊界值因精度被排除
+        # 直接比較底層 numpy 陣列 (float32 欄位取出時不複製)，省去 pandas Series 運算與索引對齊
+        pe, pb = MARKET_DF['PE'].to_numpy(), MARKET_DF['PB'].to_numpy()
+        pe_max, pb_max = np.float32(pe_lim), np.float32(pb_lim)
+        idx = np.flatnonzero((pe > 0) & (pe <= pe_max) & (pb > 0) & (pb <= pb_max))
+        df_res = MARKET_DF.iloc[idx].reset_index()
         if not df_res.empty:
             df_res = df_res.sort_values(by=['產業', 'PE', 'PB'], ascending=[True, True, True])
             st.session_state.scan_results_df = df_res
@@ -249,26 +186,35 @@ elif st.session_state.menu == "screening":
         if not df_display.empty:
             st.info(f"符合標的共 {len(df_display)} 筆")
             sc_cols = st.columns(3)
-            for i, (idx, row) in enumerate(df_display.iterrows()):
-                with sc_cols[i % 3]:
-                    # 改用 FinMind
-                    h_df = fetch_finmind_history(row['代碼'])
-                    strat_name, strat_color, _, _ = get_strategy_suggestion(h_df)
-                    st.markdown(f"""
-                    <div class="stock-card">
-                        <div style="display:flex; justify-content:space-between;"><b>{row['代碼']} {row['名稱']}</b><span class="group-tag">{row['產業']}</span></div>
-                        <hr style="margin:8px 0; border:0; border-top:1px solid #eee;">
-                        <div style="font-size:1.1em; margin-bottom:5px;">現價: <b>${row['現價']}</b></div>
-                        <div style="font-size:0.85em; color:#666;">PE: {row['PE']} | PB: {row['PB']}</div>
-                        <div class="strategy-tag" style="background-color:{strat_color};">策略建議: {strat_name}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    if st.button(f"技術診斷 {row['代碼']}", key=f"sc_{row['代碼']}"):
-                        if h_df is not None: st.session_state.current_plot = (h_df, row['名稱'])
+            # 篩選結果的歷史數據同樣整批並行抓取
+            snapshots = fetch_strategy_snapshots(tuple(sorted(df_display['代碼'])))
+            strats = get_strategy_tags([snapshots.get(c) for c in df_display['代碼']])
+            rows = zip(*(df_display[c].to_numpy() for c in ['代碼', '名稱', '產業', '現價', 'PE', 'PB']), strats)
+            # 每欄的卡片 HTML 合併成一次 markdown 輸出，按鈕於卡片下方另外輸出
+            col_html, col_buttons = [[], [], []], [[], [], []]
+            for i, (code, name, industry, price, pe, pb, (strat_name, strat_color)) in enumerate(rows):
+                col_html[i % 3].append(f"""
+                <div class="stock-card">
+                    <div style="display:flex; justify-content:space-between;"><b>{code} {name}</b><span class="group-tag">{industry}</span></div>
+                    <hr style="margin:8px 0; border:0; border-top:1px solid #eee;">
+                    <div style="font-size:1.1em; margin-bottom:5px;">現價: <b>${price}</b></div>
+                    <div style="font-size:0.85em; color:#666;">PE: {pe} | PB: {pb}</div>
+                    <div class="strategy-tag" style="background-color:{strat_color};">策略建議: {strat_name}</div>
+                </div>
+                """)
+                col_buttons[i % 3].append((code, name))
+            for col, html_chunks, buttons in zip(sc_cols, col_html, col_buttons):
+                with col:
+                    if html_chunks: st.markdown(''.join(html_chunks), unsafe_allow_html=True)
+                    for code, name in buttons:
+                        if st.button(f"技術診斷 {code}", key=f"sc_{code}"):
+                            h_df = fetch_finmind_history(code)
+                            if h_df is not None: st.session_state.current_plot = (h_df, name)
 
 elif st.session_state.menu == "diagnosis":
     st.markdown('<div class="function-title">功能：🔍 全市場技術分析診斷</div>', unsafe_allow_html=True)
-    selection = st.selectbox("搜尋標的", options=["請選擇..."] + STOCK_OPTIONS)
+    # 選單清單只有搜尋頁用得到，於此才取用 (已快取，不會每次重跑都重組)
+    selection = st.selectbox("搜尋標的", options=["請選擇..."] + get_stock_options())
     if st.button("執行診斷") and selection != "請選擇...":
         code, name = selection.split(" ")[0], selection.split(" ")[1]
         # 改用 FinMind
@@ -280,7 +226,7 @@ elif st.session_state.menu == "management":
     
     with st.expander("➕ 新增標的至庫存", expanded=True):
         c1, c2, c3 = st.columns(3)
-        new_sel = c1.selectbox("搜尋標的", options=["請選擇..."] + STOCK_OPTIONS)
+        new_sel = c1.selectbox("搜尋標的", options=["請選擇..."] + get_stock_options())
         new_cost = c2.number_input("買入單價", min_value=0.0, step=0.1, key="add_cost")
         new_shares = c3.number_input("買入股數", min_value=1, step=100, key="add_shares")
         
@@ -300,12 +246,15 @@ elif st.session_state.menu == "management":
         final_df = edited_df[edited_df['Shares'] > 0].copy()
         with st.spinner('正在同步至 Google Sheets...'):
             try:
-                gc = get_gsheet_client()
-                sh = gc.open(PORTFOLIO_SHEET_TITLE).sheet1
-                sh.clear()
-                sh.update('A1', [final_df.columns.tolist()] + final_df.values.tolist())
+                sh = get_worksheet()
+                # 單次寫入固定範圍取代 clear + update；刪除的列以空白覆蓋，RAW 省去逐格解析
+                values = [final_df.columns.tolist()] + final_df.values.tolist()
+                values += [[''] * len(final_df.columns)] * (len(edited_df) - len(final_df))
+                end_cell = gspread.utils.rowcol_to_a1(len(values), len(final_df.columns))
+                sh.update(range_name=f'A1:{end_cell}', values=values, value_input_option='RAW')
                 st.session_state.df_portfolio = final_df
-                st.cache_data.clear()
+                # 只清除庫存清單的快取，市場與歷史數據不受影響
+                load_portfolio.clear()
                 st.success("🎉 資料已成功寫入 Excel！")
                 time.sleep(1)
                 st.rerun()
@@ -315,26 +264,13 @@ elif st.session_state.menu == "management":
 # --- 底部圖表 ---
 if 'current_plot' in st.session_state:
     st.divider()
-    p_df, p_name = st.session_state.current_plot
-    status, color, html, note = get_strategy_suggestion(p_df)
+    p_data, p_name = st.session_state.current_plot
+    status, color, html, note = get_strategy_suggestion(p_data)
     st.markdown(f"### 💡 AI 策略詳細分析：{p_name}")
     st.markdown(html, unsafe_allow_html=True)
     
-    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.5, 0.2, 0.3],
-                        subplot_titles=("股價 K 線與均線", "RSI 強弱指標", "MACD 指標"))
-    fig.add_trace(go.Candlestick(x=p_df.index, open=p_df['Open'], high=p_df['High'], low=p_df['Low'], close=p_df['Close'], name='K線'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['SMA20'], line=dict(color='orange', width=1), name='20MA'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['SMA60'], line=dict(color='blue', width=1), name='60MA'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['Lower'], line=dict(color='rgba(200,200,200,0.5)', dash='dot'), name='BB下軌'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['RSI'], line=dict(color='purple'), name='RSI(14)'), row=2, col=1)
-    fig.add_hline(y=70, line_dash="dash", line_color="red", row=2, col=1)
-    fig.add_hline(y=30, line_dash="dash", line_color="green", row=2, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['MACD'], line=dict(color='blue'), name='DIF'), row=3, col=1)
-    fig.add_trace(go.Scatter(x=p_df.index, y=p_df['Signal'], line=dict(color='orange'), name='MACD'), row=3, col=1)
-    bar_colors = ['#eb093b' if val >= 0 else '#00a651' for val in p_df['Hist']]
-    fig.add_trace(go.Bar(x=p_df.index, y=p_df['Hist'], marker_color=bar_colors, name='OSC柱狀圖'), row=3, col=1)
-    fig.update_layout(height=850, xaxis_rangeslider_visible=False, template="plotly_white")
-    st.plotly_chart(fig, use_container_width=True)
+    fig = build_fig(p_name, p_data['index'][-1], float(p_data['last2'][-1, 0]), p_data)
+    st.plotly_chart(fig, use_container_width=True, config={'staticPlot': False, 'responsive': True})
 
 
 
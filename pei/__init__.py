@@ -0,0 +1 @@
+"""台股戰情指揮中心共用模組"""
@@ -0,0 +1,284 @@
+"""
+市場數據、FinMind 歷史 K 線與策略判讀；所有頁面共用同一份定義與快取
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bottleneck as bn
+import numpy as np
+import pandas as pd
+import requests_cache
+import streamlit as st
+from lxml import html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from pei.indicators import compute_indicators_full, compute_indicators_tail
+
+# 對外 HTTP 回應落地快取，重啟或換 worker 後仍可直接讀取；過期時先回舊資料再背景更新
+HTTP_SESSION = requests_cache.CachedSession('.finmind_cache', backend='sqlite', expire_after=3600, stale_while_revalidate=True)
+# 共用連線池省去每次 TCP/TLS 交握，暫時性錯誤自動退避重試
+HTTP_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(
+    total=3, status_forcelist=[429, 500, 502, 503, 504], backoff_factor=0.25)))
+HTTP_SESSION.headers['User-Agent'] = 'Mozilla/5.0'
+# (連線, 讀取) 逾時秒數
+HTTP_TIMEOUT = (3.05, 15)
+
+# wespai 清單表格中 代碼、名稱、產業、現價、PE、PB 所在的欄位
+MARKET_TD_COLS = [0, 1, 2, 3, 14, 15]
+
+@st.cache_data(ttl=3600)
+def get_market_data():
+    url = "https://stock.wespai.com/lists"
+    try:
+        res = HTTP_SESSION.get(url, timeout=HTTP_TIMEOUT)
+        # 只解析第一個表格且只取需要的欄位，不必像 read_html 把整頁表格都轉成 DataFrame；表頭為 th，自然略過
+        tree = html.fromstring(res.text)
+        rows = [r.xpath('./td') for r in tree.xpath('(//table)[1]//tr')]
+        data = pd.DataFrame([[r[i].text_content().strip() for i in MARKET_TD_COLS] for r in rows if len(r) > MARKET_TD_COLS[-1]],
+                            columns=['代碼', '名稱', '產業', '現價', 'PE', 'PB'])
+        data['代碼'] = data['代碼'].astype(str).str.zfill(4)
+        # 數值欄位以 float32 緊密存放，篩選時整欄比較
+        data['現價'] = pd.to_numeric(data['現價'], errors='coerce').astype(np.float32)
+        data['PE'] = pd.to_numeric(data['PE'], errors='coerce').fillna(999.0).astype(np.float32)
+        data['PB'] = pd.to_numeric(data['PB'], errors='coerce').fillna(999.0).astype(np.float32)
+        data['產業'] = data['產業'].astype('category')
+        return data.set_index('代碼')
+    except Exception as e:
+        st.error(f"市場數據抓取失敗: {e}")
+        return pd.DataFrame(columns=['名稱', '產業', '現價', 'PE', 'PB'], index=pd.Index([], name='代碼'))
+
+@st.cache_data(ttl=3600)
+def get_stock_options():
+    """
+    搜尋選單的「代碼 名稱 (產業)」清單，跟著市場數據一起快取，不必每次互動重建
+    """
+    df = get_market_data()
+    return (df.index.astype(str) + ' ' + df['名稱'].astype(str) + ' (' + df['產業'].astype(str) + ')').tolist()
+
+# 策略類別依判斷優先順序排列，索引即 classify_strategies 的回傳值
+STRATEGY_TAGS = [("極度恐慌", "#d32f2f"), ("黃金買訊", "#2e7d32"), ("高檔過熱", "#ef6c00"), ("多頭續抱", "#1976d2"), ("觀望整理", "#757575")]
+NO_DATA_TAG = ("資料不足", "#9e9e9e")
+# 各策略的說明區塊與卡片備註，順序同 STRATEGY_TAGS；只有 RSI 需要代入
+STRATEGY_TEMPLATES = [
+    ("<div style='background:#ffebee; padding:10px; border-left:5px solid #d32f2f; border-radius:5px;'><b style='color:#d32f2f'>⚠️ 極度恐慌 (RSI < 25)</b><br>RSI: {rsi:.1f}，市場情緒悲觀。</div>", "RSI: {rsi:.1f}"),
+    ("<div style='background:#e8f5e9; padding:10px; border-left:5px solid #2e7d32; border-radius:5px;'><b style='color:#2e7d32'>🔥 強力買進訊號</b><br>RSI低檔 + 布林下軌 + MACD轉折。</div>", "技術面買訊"),
+    ("<div style='background:#fff3e0; padding:10px; border-left:5px solid #ef6c00; border-radius:5px;'><b style='color:#ef6c00'>⛔ 高檔過熱 (RSI > 75)</b><br>RSI: {rsi:.1f}，建議減碼。</div>", "RSI: {rsi:.1f}"),
+    ("<div style='background:#e3f2fd; padding:10px; border-left:5px solid #1976d2; border-radius:5px;'><b style='color:#1976d2'>📈 多頭排列</b><br>股價動能強勁。</div>", "動能強勁"),
+    ("<div style='background:#f5f5f5; padding:10px; border-left:5px solid #757575; border-radius:5px;'><b style='color:#616161'>☕ 盤整中</b><br>等待趨勢確立。</div>", "RSI: {rsi:.1f}"),
+]
+# payload['last2'] 的欄位順序
+STRATEGY_COLS = ['Close', 'RSI', 'Hist', 'Lower', 'SMA20', 'SMA60']
+
+def classify_strategies(payloads):
+    """
+    一次判斷多檔標的的策略類別，回傳 STRATEGY_TAGS 的索引陣列，資料不足者為 -1
+    """
+    classes = np.full(len(payloads), -1)
+    valid = [i for i, p in enumerate(payloads) if p is not None and p['n'] >= 26]
+    if not valid:
+        return classes
+    # (檔數, 最後兩列, 欄位)
+    last = np.stack([payloads[i]['last2'] for i in valid]).astype(np.float64)
+    curr_price, rsi, macd_hist, bb_lower, sma20, sma60 = last[:, 1].T
+    prev_macd_hist = last[:, 0, 2]
+
+    is_panic = rsi < 25
+    is_oversold = rsi < 35
+    is_buy_zone = curr_price < bb_lower * 1.02
+    macd_turn_up = (macd_hist < 0) & (macd_hist > prev_macd_hist)
+    is_bullish_trend = (curr_price > sma20) & (sma20 > sma60)
+
+    classes[valid] = np.select(
+        [is_panic, is_oversold & is_buy_zone & macd_turn_up, rsi > 75, is_bullish_trend & (macd_hist > 0)],
+        [0, 1, 2, 3], default=4)
+    return classes
+
+def get_strategy_tags(payloads):
+    """
+    卡片用的批次策略標籤，回傳 [(名稱, 顏色), ...]
+    """
+    return [STRATEGY_TAGS[c] if c >= 0 else NO_DATA_TAG for c in classify_strategies(payloads)]
+
+def get_strategy_suggestion(payload):
+    cls = classify_strategies([payload])[0]
+    if cls < 0:
+        return ("資料不足", "#9e9e9e", "<span>資料不足以產生訊號</span>", "")
+    rsi = payload['last2'][-1, 1]
+    name, color = STRATEGY_TAGS[cls]
+    html_tpl, note_tpl = STRATEGY_TEMPLATES[cls]
+    return (name, color, html_tpl.format(rsi=rsi), note_tpl.format(rsi=rsi))
+
+# 使用 FinMind 開放 API
+FINMIND_API_URL = "https://api.finmindtrade.com/api/v4/data"
+FINMIND_MAX_WORKERS = 8
+HISTORY_DAYS = 730
+# 每檔歷史 K 線連同指標遞迴狀態存成 Parquet，之後只補抓新的 K 棒
+HISTORY_STORE_DIR = Path('.cache')
+PRICE_COLS = ['Open', 'High', 'Low', 'Close']
+INDICATOR_COLS = ['SMA20', 'Lower', 'RSI', 'MACD', 'Signal', 'Hist']
+STATE_COLS = ['_AvgUp', '_AvgDn', '_EmaFast', '_EmaSlow', '_EmaSig']
+STORE_COLS = PRICE_COLS + ['SMA60'] + INDICATOR_COLS + STATE_COLS
+
+def _download_finmind_prices(symbol, start):
+    """
+    向 FinMind 取得單一標的自 start 起的日 K，欄位統一為 yfinance 格式
+    """
+    params = {
+        "dataset": "TaiwanStockPrice",
+        "data_id": symbol,
+        "start_date": start.strftime('%Y-%m-%d'),
+        "end_date": datetime.now().strftime('%Y-%m-%d'),
+    }
+
+    res = HTTP_SESSION.get(FINMIND_API_URL, params=params, timeout=HTTP_TIMEOUT)
+    data = res.json()
+
+    if data['msg'] != 'success' or not data['data']:
+        return None
+
+    df = pd.DataFrame(data['data'])
+    # 統一欄位名稱與 yfinance 格式一致以維持後續邏輯
+    df = df.rename(columns={
+        'date': 'Date',
+        'open': 'Open',
+        'max': 'High',
+        'min': 'Low',
+        'close': 'Close',
+        'trading_volume': 'Volume'
+    })
+    df['Date'] = pd.to_datetime(df['Date'])
+    df.set_index('Date', inplace=True)
+    # 只有 OHLC 會用於繪圖與指標計算，成交量、成交金額等欄位不帶進存檔與快取
+    return df[PRICE_COLS]
+
+def _add_indicators(df):
+    # 布林、RSI、MACD 由編譯後的單次走訪核心一併算出
+    close = df['Close'].to_numpy(np.float64)
+    *values, state = compute_indicators_full(close)
+    for col, arr in zip(INDICATOR_COLS, values):
+        df[col] = arr
+    df[STATE_COLS] = state
+    # SMA60 以 bottleneck 的 O(n) 滑動視窗計算
+    df['SMA60'] = bn.move_mean(close, 60)
+    return df
+
+def _extend_indicators(cached, new):
+    """
+    將新 K 棒接在已算好指標的歷史之後，只從上一列的遞迴狀態往後計算
+    """
+    df = pd.concat([cached, new])
+    start = len(cached)
+    close = df['Close'].to_numpy(np.float64)
+    prev_state = cached[STATE_COLS].to_numpy(np.float64)[-1]
+    *values, state = compute_indicators_tail(close, start, prev_state)
+    tail = df.index[start:]
+    for col, arr in zip(INDICATOR_COLS, values):
+        df.loc[tail, col] = arr
+    df.loc[tail, STATE_COLS] = state
+    # SMA60 只需要新 K 棒往前 59 筆收盤價
+    df.loc[tail, 'SMA60'] = bn.move_mean(close[max(0, start - 59):], 60)[-len(tail):]
+    return df
+
+def _fetch_history_delta(symbol):
+    """
+    讀取本地 Parquet 歷史，並只下載最後一根 K 棒 (含) 之後的資料，回傳 (cached, new)
+    """
+    store = HISTORY_STORE_DIR / f'{symbol}.parquet'
+    cached = None
+    if store.exists():
+        try:
+            # 舊存檔可能含其他欄位，讀取時一併略過
+            cached = pd.read_parquet(store, columns=STORE_COLS)
+        except Exception:
+            cached = None
+    if cached is None or cached.empty:
+        return None, _download_finmind_prices(symbol, datetime.now() - timedelta(days=HISTORY_DAYS))
+    # 最後一根可能是盤中資料，從該日重新抓取並覆蓋
+    return cached, _download_finmind_prices(symbol, cached.index[-1])
+
+def _to_payload(df):
+    """
+    將歷史 DataFrame 轉成快取用的 struct-of-arrays dict，價格與指標皆為 float32
+    本地存檔仍保留 float64 以利增量運算；對外只供判讀與繪圖，float32 足夠
+    """
+    col = lambda c: df[c].to_numpy(np.float32)
+    payload = {
+        'n': len(df),
+        'index': df.index,
+        'ohlc': df[PRICE_COLS].to_numpy(np.float32),
+        'sma20': col('SMA20'),
+        'sma60': col('SMA60'),
+        'lower': col('Lower'),
+        'rsi': col('RSI'),
+        'macd': col('MACD'),
+        'signal': col('Signal'),
+        'hist': col('Hist'),
+    }
+    # 策略判讀只看最後兩列，預先切好 (2, 6) 陣列，欄位順序同 STRATEGY_COLS
+    payload['last2'] = df[STRATEGY_COLS].to_numpy(np.float32)[-2:]
+    return payload
+
+def _to_snapshot(payload):
+    """
+    卡片列表只需判讀策略，僅保留筆數與最後兩列，classify_strategies 可直接使用
+    """
+    if payload is None:
+        return None
+    return {'n': payload['n'], 'last2': payload['last2']}
+
+def _merge_history(symbol, cached, new):
+    """
+    合併本地歷史與新資料、增量更新指標並寫回 Parquet，回傳 _to_payload 格式的 dict
+    """
+    if new is None:
+        df = cached
+    else:
+        keep = cached[cached.index < new.index[0]] if cached is not None else None
+        if keep is None or keep.empty:
+            df = _add_indicators(new)
+        else:
+            df = _extend_indicators(keep, new)
+        df = df[df.index >= datetime.now() - timedelta(days=HISTORY_DAYS)]
+        HISTORY_STORE_DIR.mkdir(exist_ok=True)
+        df.to_parquet(HISTORY_STORE_DIR / f'{symbol}.parquet')
+    if df is None or df.empty:
+        return None
+    return _to_payload(df)
+
+@st.cache_data(ttl=600, max_entries=256)
+def fetch_finmind_history(symbol):
+    """
+    取代 yfinance 爬取 FinMind 的數據，並維持原始技術指標邏輯
+    """
+    try:
+        return _merge_history(symbol, *_fetch_history_delta(symbol))
+    except Exception as e:
+        # st.error(f"獲取 {symbol} 失敗: {e}")
+        return None
+
+def _safe_fetch_history_delta(symbol):
+    try:
+        return _fetch_history_delta(symbol)
+    except Exception:
+        return None, None
+
+@st.cache_data(ttl=600)
+def fetch_strategy_snapshots(symbols):
+    """
+    一次更新多檔標的歷史數據，回傳卡片用的 {代碼: snapshot}；symbols 請傳入排序後的 tuple 以共用快取
+    完整歷史已寫入本地 Parquet，點選查看技術分析時再以 fetch_finmind_history 載入繪圖
+    免費版 FinMind 不支援多檔同時查詢，改以多執行緒同時發出請求
+    """
+    # 網路請求為 I/O 等待，並行後總耗時約為最慢的一次往返
+    with ThreadPoolExecutor(max_workers=FINMIND_MAX_WORKERS) as ex:
+        raw = list(ex.map(_safe_fetch_history_delta, symbols))
+    # 全部下載完成後再計算指標，避免運算卡在等待網路的執行緒中
+    results = {}
+    for sym, (cached, new) in zip(symbols, raw):
+        try:
+            results[sym] = _to_snapshot(_merge_history(sym, cached, new))
+        except Exception:
+            results[sym] = None
+    return results
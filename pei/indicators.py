@@ -0,0 +1,139 @@
+"""
+技術指標運算核心：以 Numba 編譯，單次走訪收盤價即算出布林、RSI 與 MACD
+"""
+import numpy as np
+from numba import njit
+
+BB_WINDOW = 20
+BB_K = 2.0
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+
+# 每根 K 棒結束後的遞迴狀態：RSI 平均漲跌幅、MACD 快慢 EMA、訊號線 EMA
+N_STATE = 5
+
+
+@njit(cache=True, fastmath=True)
+def _indicator_pass(close, start, avg_up, avg_dn, ema_fast, ema_slow, ema_sig):
+    """
+    從 close[start] 開始走訪到結尾，start 之前的資料只用來補滿布林視窗
+    回傳 start 之後各列的 (sma20, lower, rsi, macd, signal, hist, state)
+    """
+    n = close.shape[0]
+    m = n - start
+    sma20 = np.full(m, np.nan)
+    lower = np.full(m, np.nan)
+    rsi = np.empty(m)
+    macd = np.empty(m)
+    signal = np.empty(m)
+    hist = np.empty(m)
+    state = np.empty((m, N_STATE))
+    if m <= 0:
+        return sma20, lower, rsi, macd, signal, hist, state
+
+    a_rsi = 1.0 / RSI_PERIOD
+    a_fast = 2.0 / (MACD_FAST + 1)
+    a_slow = 2.0 / (MACD_SLOW + 1)
+    a_sig = 2.0 / (MACD_SIGNAL + 1)
+
+    # 以視窗首筆收盤價為基準平移，降低平方和相減時的精度損失
+    first = max(0, start - BB_WINDOW)
+    shift = close[first]
+    win_sum = 0.0
+    win_sq = 0.0
+    for j in range(first, start):
+        x = close[j] - shift
+        win_sum += x
+        win_sq += x * x
+
+    for i in range(start, n):
+        k = i - start
+        c = close[i]
+
+        # 布林通道：視窗滑動時加入新值、扣除移出的舊值
+        x = c - shift
+        win_sum += x
+        win_sq += x * x
+        if i >= BB_WINDOW:
+            old = close[i - BB_WINDOW] - shift
+            win_sum -= old
+            win_sq -= old * old
+        if i >= BB_WINDOW - 1:
+            mean = win_sum / BB_WINDOW
+            var = (win_sq - win_sum * mean) / (BB_WINDOW - 1)
+            if var < 0.0:
+                var = 0.0
+            sma20[k] = mean + shift
+            lower[k] = sma20[k] - BB_K * np.sqrt(var)
+
+        # RSI：與 TA-Lib 相同，前 14 筆漲跌幅取簡單平均作為起點，之後 Wilder 平滑 (prev * 13 + new) / 14
+        if i > 0:
+            d = c - close[i - 1]
+            up = d if d > 0.0 else 0.0
+            dn = -d if d < 0.0 else 0.0
+            if i <= RSI_PERIOD:
+                avg_up += up / RSI_PERIOD
+                avg_dn += dn / RSI_PERIOD
+            else:
+                avg_up += a_rsi * (up - avg_up)
+                avg_dn += a_rsi * (dn - avg_dn)
+        if i >= RSI_PERIOD:
+            denom = avg_dn if avg_dn != 0.0 else 1e-9
+            rsi[k] = 100.0 - 100.0 / (1.0 + avg_up / denom)
+        else:
+            rsi[k] = np.nan
+
+        # MACD：快慢 EMA 差值，再以 9 日 EMA 作為訊號線
+        ema_fast += a_fast * (c - ema_fast)
+        ema_slow += a_slow * (c - ema_slow)
+        diff = ema_fast - ema_slow
+        if i == 0:
+            ema_sig = diff
+        else:
+            ema_sig += a_sig * (diff - ema_sig)
+        macd[k] = diff
+        signal[k] = ema_sig
+        hist[k] = diff - ema_sig
+
+        state[k, 0] = avg_up
+        state[k, 1] = avg_dn
+        state[k, 2] = ema_fast
+        state[k, 3] = ema_slow
+        state[k, 4] = ema_sig
+
+    return sma20, lower, rsi, macd, signal, hist, state
+
+
+def compute_indicators_full(close):
+    """
+    輸入 float64 收盤價陣列，回傳 (sma20, lower, rsi, macd, signal, hist, state)
+    布林為樣本標準差；RSI 與 TA-Lib 一致 (前 14 筆為 NaN)；MACD 與 pandas ewm(adjust=False) 一致，以首筆收盤價起算
+    state 為每列結束後的遞迴狀態 (n, N_STATE)，供之後增量更新使用
+    """
+    if close.shape[0] == 0:
+        return _indicator_pass(close, 0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    return _indicator_pass(close, 0, 0.0, 0.0, close[0], close[0], 0.0)
+
+
+def compute_indicators(close):
+    """
+    輸入 float64 收盤價陣列，回傳 (sma20, lower, rsi, macd, signal, hist)
+    """
+    return compute_indicators_full(close)[:6]
+
+
+def compute_indicators_tail(close, start, state):
+    """
+    只計算 close[start:] 的指標；state 為 close[start - 1] 那一列的遞迴狀態
+    布林視窗只需要 start 前 20 筆收盤價，因此 close 至少要包含這段尾巴
+    """
+    return _indicator_pass(close, start, state[0], state[1], state[2], state[3], state[4])
+
+
+# 匯入時先以小陣列觸發編譯 (cache=True 會寫入 __pycache__)，避免首次瀏覽時等待 JIT
+try:
+    compute_indicators(np.zeros(30, dtype=np.float64))
+except Exception:
+    pass